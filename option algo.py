@@ -1,7 +1,18 @@
+import io
+import math
+
 import streamlit as st
 import pandas as pd
 import numpy as np
 
+try:
+    from numba import njit
+except ImportError:  # numba is optional; fall back to plain Python
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
 # -------------------------------
 # App Title
 # -------------------------------
@@ -24,6 +35,25 @@ can manipulate prices in a *non-liquid option* scenario.
 # -------------------------------
 # Sidebar Parameters
 # -------------------------------
+class StepParseError(ValueError):
+    """Raised when a comma-separated steps input can't be parsed."""
+
+
+# Same ceiling as the price inputs; keeps 100 steps of momentum far from overflow
+MAX_STEP = 200.0
+
+
+@st.cache_data(show_spinner=False)
+def parse_steps(text):
+    try:
+        steps = tuple(float(x) for x in text.split(","))
+    except ValueError:
+        raise StepParseError(f"Could not parse '{text}' as comma-separated numbers.") from None
+    if not all(math.isfinite(step) and 0 < step <= MAX_STEP for step in steps):
+        raise StepParseError(f"Steps in '{text}' must all be positive and at most {MAX_STEP:g}.")
+    return steps
+
+
 st.sidebar.header("🔧 Simulation Parameters")
 fair_price = st.sidebar.number_input("Fair Value of Option", 20.0, 200.0, 40.0, step=1.0)
 initial_bid = st.sidebar.number_input("Initial Algo Bid", 1.0, 200.0, 20.0, step=1.0)
@@ -31,70 +61,236 @@ initial_ask = st.sidebar.number_input("Initial Algo Ask", 1.0, 200.0, 80.0, step
 human_limit_buy = st.sidebar.number_input("Human Buy Order Price", 1.0, 200.0, 21.0, step=1.0)
 algo_step = st.sidebar.slider("Algo Aggressive Step", 0.5, 5.0, 1.0, 0.5)
 max_steps = st.sidebar.slider("Simulation Steps", 10, 100, 30, 5)
+seed = st.sidebar.number_input("Random Seed", 0, 10_000, 42, step=1)
+bid_steps_text = st.sidebar.text_input("Momentum Bid Steps", "0.5, 1.0, 2.0")
+ask_spreads_text = st.sidebar.text_input("Momentum Ask Spreads", "2.0, 3.0, 5.0")
+
+try:
+    bid_steps = parse_steps(bid_steps_text)
+    ask_spread_steps = parse_steps(ask_spreads_text)
+except StepParseError as e:
+    st.sidebar.error(str(e))
+    st.stop()
 
 # -------------------------------
 # Simulation Logic
 # -------------------------------
-bid = initial_bid
-ask = initial_ask
-reset_bid, reset_ask = initial_bid, initial_ask
-fair_threshold = fair_price * 1.20
-
-logs = []
-human_position = 0
-human_avg_price = None
-
-for t in range(max_steps):
-    event = ""
-    mid = (bid + ask) / 2
-    logs.append({"t": t, "bid": bid, "ask": ask, "mid": mid, "event": event})
-
-    # Step 1: Human posts buy order
-    if t == 1:
-        event += f"Human posts buy @ ₹{human_limit_buy:.2f}. "
-
-    # Step 2: Algo reacts
-    if t >= 1 and human_limit_buy > bid:
-        bid = human_limit_buy + algo_step
-        ask = max(ask, bid + 2)
-        event += f"Algo bumps bid to ₹{bid:.2f}. "
-
-    # Step 3: Random market momentum
-    if t >= 2:
-        bid += np.random.choice([0.5, 1.0, 2.0])
-        ask = max(ask, bid + np.random.choice([2.0, 3.0, 5.0]))
-        event += "Momentum buyers push price up. "
-
-    # Step 4: Price exceeds 20% above fair
-    if (bid + ask) / 2 >= fair_threshold:
-        sell_price = max(ask, fair_threshold)
-        if human_position == 0:
-            human_position = 1
-            human_avg_price = sell_price
-            event += f"Algo sells to human @ ₹{sell_price:.2f}. "
-        bid, ask = reset_bid, reset_ask
-        logs.append({
-            "t": t + 0.1,
-            "bid": bid,
-            "ask": ask,
-            "mid": (bid + ask)/2,
-            "event": f"Algo resets quotes to ₹{bid:.2f}/₹{ask:.2f}"
-        })
-        break
-
-    logs[-1]["event"] = event
+# Event flags recorded by the core; combined per row and mapped to text
+EV_HUMAN_POST = 1
+EV_ALGO_BUMP = 2
+EV_MOMENTUM = 4
+EV_RESET = 8
+EV_ALGO_SELL = 16
+
+# Text per flag, in display order; placeholders are filled once per run
+EVENT_TEXT = (
+    (EV_HUMAN_POST, "Human posts buy @ ₹{human_limit_buy:.2f}. "),
+    (EV_ALGO_BUMP, "Algo bumps bid to ₹{bump_bid:.2f}. "),
+    (EV_MOMENTUM, "Momentum buyers push price up. "),
+    (EV_ALGO_SELL, "Algo sells to human @ ₹{sell_price:.2f}. "),
+    (EV_RESET, "Algo resets quotes to ₹{initial_bid:.2f}/₹{initial_ask:.2f}"),
+)
+
+# Algo dumps on the human once the mid is 20% above fair
+FAIR_PREMIUM = 1.20
+
+
+def _simulate_core_py(initial_bid, initial_ask, human_limit_buy, algo_step, fair_threshold,
+                      bid_moves, ask_spreads):
+    max_steps = bid_moves.shape[0] + 2
+    times = np.empty(max_steps + 1, dtype=np.float64)
+    bids = np.empty(max_steps + 1, dtype=np.float64)
+    asks = np.empty(max_steps + 1, dtype=np.float64)
+    codes = np.zeros(max_steps + 1, dtype=np.int8)
+    bid = initial_bid
+    ask = initial_ask
+    sell_price = np.nan
+    idx = 0
+
+    for t in range(max_steps):
+        times[idx] = t
+        bids[idx] = bid
+        asks[idx] = ask
+        idx += 1
+        code = 0
+
+        # Step 1: Human posts buy order
+        if t == 1:
+            code |= EV_HUMAN_POST
+
+        # Step 2: Algo reacts
+        if t >= 1 and human_limit_buy > bid:
+            bid = human_limit_buy + algo_step
+            ask = max(ask, bid + 2)
+            code |= EV_ALGO_BUMP
+
+        # Step 3: Random market momentum
+        if t >= 2:
+            bid += bid_moves[t - 2]
+            ask = max(ask, bid + ask_spreads[t - 2])
+            code |= EV_MOMENTUM
+
+        # Step 4: Price exceeds 20% above fair
+        if (bid + ask) / 2 >= fair_threshold:
+            sell_price = max(ask, fair_threshold)
+            codes[idx - 1] = code | EV_ALGO_SELL
+            times[idx] = t + 0.1
+            bids[idx] = initial_bid
+            asks[idx] = initial_ask
+            codes[idx] = EV_RESET
+            idx += 1
+            break
+
+        codes[idx - 1] = code
+
+    return times[:idx], bids[:idx], asks[:idx], codes[:idx], sell_price
+
+
+# Streamlit re-executes this script on every rerun, so a module-level
+# @njit would build a fresh dispatcher (and reload from disk) each time.
+# Holding the dispatcher as a resource keeps the compiled code alive.
+# Streamlit keys the resource on _get_core's own source, so the core's
+# fingerprint is passed in to rebuild the dispatcher when the core is edited.
+# Set NUMBA_DISABLE_JIT=1 to run the core as plain Python while iterating.
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _get_core(fingerprint):
+    core = njit(cache=True)(_simulate_core_py)
+    # Compile (or load from numba's on-disk cache) once per server process,
+    # with the same argument types simulate() passes
+    moves = np.ones(1, dtype=np.float64)
+    core(20.0, 80.0, 21.0, 1.0, 48.0, moves, moves)
+    return core
+
+
+def _core_fingerprint():
+    # Bytecode, constants and the event flags compiled into the core
+    code = _simulate_core_py.__code__
+    return (code.co_code, code.co_consts,
+            (EV_HUMAN_POST, EV_ALGO_BUMP, EV_MOMENTUM, EV_RESET, EV_ALGO_SELL))
+
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def simulate(fair_price, initial_bid, initial_ask, human_limit_buy, algo_step, max_steps, seed,
+             bid_steps, ask_spread_steps):
+    """Run the quote-manipulation scenario and return ``(df, summary)``.
+
+    ``summary`` is ``(human_position, human_avg_price, pnl)``; the price and
+    P&L are ``None`` when the algo never sells to the human.
+
+    Cached on the sidebar inputs, so reruns that don't change a parameter
+    skip the simulation and DataFrame construction. The momentum draws come
+    from a seeded generator so a cached result matches a fresh run.
+    """
+    rng = np.random.default_rng(seed)
+    fair_threshold = fair_price * FAIR_PREMIUM
+    bid_moves = rng.choice(bid_steps, size=max_steps - 2)
+    ask_spreads = rng.choice(ask_spread_steps, size=max_steps - 2)
+
+    times, bids, asks, codes, sell_price = _get_core(_core_fingerprint())(
+        float(initial_bid), float(initial_ask), float(human_limit_buy), float(algo_step),
+        float(fair_threshold), bid_moves, ask_spreads,
+    )
+
+    # Map each distinct event code to its text once; the rows keep integer
+    # codes into that table (distinct flag sets always give distinct text)
+    values = {
+        "human_limit_buy": human_limit_buy,
+        "bump_bid": human_limit_buy + algo_step,
+        "initial_bid": initial_bid,
+        "initial_ask": initial_ask,
+        "sell_price": sell_price,
+    }
+    fragments = [(flag, text.format(**values)) for flag, text in EVENT_TEXT]
+    unique_codes, inverse = np.unique(codes, return_inverse=True)
+    texts = [
+        "".join(text for flag, text in fragments if code & flag)
+        for code in unique_codes
+    ]
+
+    human_position = 0
+    human_avg_price = None
+    pnl = None
+    if not np.isnan(sell_price):
+        human_position = 1
+        human_avg_price = float(sell_price)
+        pnl = (fair_price - human_avg_price) * human_position
+
+    df = pd.DataFrame({
+        "t": times,
+        "bid": bids,
+        "ask": asks,
+        "mid": (bids + asks) / 2,
+        "event": pd.Categorical.from_codes(inverse, categories=texts),
+    })
+    return df, (human_position, human_avg_price, pnl)
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def simulate_batch(fair_price, initial_bid, initial_ask, human_limit_buy, algo_step, max_steps,
+                   seed, bid_steps, ask_spread_steps, n_paths):
+    """Run ``n_paths`` independent scenarios at once and return one row per path.
+
+    Applies the same rules as ``_simulate_core_py`` to ``(n_paths, max_steps)``
+    arrays. With positive momentum steps the algo can only bump its bid at
+    t=1, so each path's quotes reduce to a cumulative sum and running max.
+    """
+    rng = np.random.default_rng(seed)
+    fair_threshold = fair_price * FAIR_PREMIUM
+    bid_moves = rng.choice(bid_steps, size=(n_paths, max_steps - 2))
+    ask_spreads = rng.choice(ask_spread_steps, size=(n_paths, max_steps - 2))
+
+    bumped = human_limit_buy > initial_bid
+    bump_bid = human_limit_buy + algo_step if bumped else initial_bid
+    bump_ask = max(initial_ask, bump_bid + 2) if bumped else initial_ask
+
+    post_bid = np.empty((n_paths, max_steps), dtype=np.float64)
+    post_bid[:, 0] = initial_bid
+    post_bid[:, 1] = bump_bid
+    post_bid[:, 2:] = bump_bid + np.cumsum(bid_moves, axis=1)
+
+    post_ask = np.empty((n_paths, max_steps), dtype=np.float64)
+    post_ask[:, 0] = initial_ask
+    post_ask[:, 1] = bump_ask
+    post_ask[:, 2:] = np.maximum(
+        bump_ask, np.maximum.accumulate(post_bid[:, 2:] + ask_spreads, axis=1)
+    )
+
+    # First step per path where the mid is 20% above fair
+    hits = (post_bid + post_ask) / 2 >= fair_threshold
+    filled = hits.any(axis=1)
+    trigger_step = np.argmax(hits, axis=1)
+    sell_price = np.where(
+        filled, np.maximum(post_ask[np.arange(n_paths), trigger_step], fair_threshold), np.nan
+    )
+
+    return pd.DataFrame({
+        "path_id": np.arange(n_paths),
+        "filled": filled,
+        "trigger_step": pd.Series(trigger_step, dtype="Int64").mask(~filled),
+        "sell_price": sell_price,
+        "pnl": fair_price - sell_price,
+    })
+
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def to_csv_bytes(df):
+    buf = io.BytesIO()
+    df.to_csv(buf, index=False, encoding="utf-8")
+    return buf.getvalue()
+
+
+df, (human_position, human_avg_price, pnl) = simulate(
+    fair_price, initial_bid, initial_ask, human_limit_buy, algo_step, max_steps, seed,
+    bid_steps, ask_spread_steps,
+)
 
 # -------------------------------
 # Display Results
 # -------------------------------
-df = pd.DataFrame(logs)
-df["mid"] = (df["bid"] + df["ask"]) / 2
-
 st.subheader("📜 Market Simulation Log")
 st.dataframe(df, use_container_width=True)
 
 if human_position > 0:
-    pnl = (fair_price - human_avg_price) * human_position
     st.subheader("💰 Human Trade Summary")
     st.write(f"*Human Buy Price:* ₹{human_avg_price:.2f}")
     st.write(f"*Fair Value:* ₹{fair_price:.2f}")
@@ -105,9 +301,35 @@ else:
 # -------------------------------
 # Download Option
 # -------------------------------
-csv = df.to_csv(index=False).encode('utf-8')
+csv = to_csv_bytes(df)
 st.download_button("⬇ Download Simulation Log (CSV)", csv, "simulation_log.csv", "text/csv")
 
+# -------------------------------
+# Monte-Carlo Batch
+# -------------------------------
+# Changing the path count reruns only this fragment, not the whole script
+@st.fragment
+def render_monte_carlo():
+    st.subheader("🎲 Monte-Carlo Batch")
+    n_paths = st.number_input("Monte-Carlo Paths", 1, 10_000, 1, step=1)
+    if n_paths == 1:
+        st.caption("Increase the path count to rerun this setup across many random paths.")
+        return
+
+    batch = simulate_batch(
+        fair_price, initial_bid, initial_ask, human_limit_buy, algo_step, max_steps, seed,
+        bid_steps, ask_spread_steps, int(n_paths),
+    )
+    fill_rate = batch["filled"].mean()
+    st.write(f"*Human filled by algo:* {fill_rate:.1%} of paths")
+    if fill_rate > 0:
+        st.write(f"*Mean Sell Price:* ₹{batch['sell_price'].mean():.2f}")
+        st.write(f"*Mean Unrealized P&L:* ₹{batch['pnl'].mean():.2f} (Loss if negative)")
+    st.dataframe(batch, use_container_width=True)
+
+
+render_monte_carlo()
+
 # -------------------------------
 # Footer
 # -------------------------------